@@ -1,16 +1,77 @@
-import uuid
-from typing import Dict, Callable, List, Optional, Set
-from wf_types import TaskSpec, Constraint, StaticConstraint, NoOutgoingEdgesConstraint, NoIncomingEdgesConstraint
-from func_registry import register, has
+import heapq
+import io
+import sys
+from array import array
+from functools import partial
+from typing import Dict, Callable, Iterator, List, Optional, Set, Tuple
+from wf_types import TaskSpec, FrozenPlan, Constraint, StaticConstraint, NoOutgoingEdgesConstraint, NoIncomingEdgesConstraint
+from func_registry import register_if_absent
+
+def _dot_quote(text: str) -> str:
+    """Quote text as a DOT string literal"""
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+# Task callables are these module-level functions bound with functools.partial,
+# so each task costs one partial object instead of a fresh closure. Each TaskSpec
+# keeps its own partial in spec.fn; the registry only keeps the first one per name.
+
+def _static_wrapper(user_fn: Callable, _ctx):  # ctx is unused in static
+    return user_fn()
+
+def _dynamic_wrapper(user_fn: Callable, name: str, is_branching: bool,
+                     label_of: Dict[int, Tuple[Callable, str]], ctx):
+    result = user_fn()
+    # Handle both single function and list of functions
+    to_register = result if isinstance(result, list) else [result]
+
+    # Enforce branching constraint: exactly one branch
+    if is_branching and len(to_register) != 1:
+        raise RuntimeError(
+            f"Branching task '{name}' must return exactly one branch, "
+            f"but returned {len(to_register)} branches"
+        )
+
+    # Labels were interned at build time; anything outside possible_branches
+    # falls through to register_branches, which rejects it
+    branch_labels = []
+    for branch_fn in to_register:
+        known = label_of.get(id(branch_fn))
+        branch_labels.append(known[1] if known and known[0] is branch_fn else branch_fn.__name__)
+    ctx.register_branches(branch_labels)
+
+def _fused_wrapper(first: Callable, second: Callable, ctx):
+    first(ctx)
+    return second(ctx)
+
+def _check_hints(name: str, cost: float, selectivity: float):
+    """Internal: Reject out-of-range scheduling hints; written so NaN fails too"""
+    if not cost > 0 or not selectivity >= 0:
+        raise ValueError(f"Task '{name}' needs cost > 0 and selectivity >= 0")
 
 class Workflow:
     def __init__(self, name: str = "Workflow"):
         self.name = name
-        self._tasks: Dict[str, TaskSpec] = {}
+        self._tasks: Dict[int, TaskSpec] = {}
+        self._next_id = 0
+        self._by_func_ref: Dict[str, int] = {}  # func_ref -> first task_id registered for it
+        self._index: Dict[int, int] = {}  # task_id -> row in the CSR arrays and FrozenPlan, see _build_csr
+        self._children: Dict[int, List[int]] = {}  # inverse of deps, see children_index
+        self._order: Dict[int, int] = {}  # task_id -> rank in a topological order kept valid by link()
+        self._max_rank = 0
+        self._plan: Optional[FrozenPlan] = None  # set by freeze(); the workflow is immutable afterwards
+        self._version = 0  # bumped on every mutation, lets run plans built elsewhere detect staleness
+        # Derived views, recomputed by _refresh() only after a mutation
+        self._dirty = True
+        self._cached_dynamic_ids: Set[int] = set()
+        self._csr: Tuple[array, array] = (array('i', [0]), array('i'))
+        self._succ_csr: Tuple[array, array] = (array('i', [0]), array('i'))
+        self._topo_cache: Optional[Tuple[int, ...]] = None  # topo_order(), dropped by _refresh()
+        self._plan_cache: Optional[FrozenPlan] = None  # plan(), dropped by _refresh()
 
     def task(self, fn: Callable,
              possible_branches: Optional[List[Callable]] = None,
-             constraints: Optional[List[Constraint]] = None) -> str:
+             constraints: Optional[List[Constraint]] = None,
+             cost: float = 1.0, selectivity: float = 1.0, pure: bool = False) -> int:
         """
         Register a task. Can be static or dynamic based on possible_branches.
 
@@ -20,10 +81,19 @@ class Workflow:
                               If None, this is a regular task.
                               If provided, fn should return Callable or List[Callable].
             constraints: Optional list of constraints to validate at runtime.
+            cost: Relative runtime estimate (> 0). Only used to order independent tasks.
+            selectivity: Expected fraction of work this task lets through (>= 0).
+                         Cheap, highly selective tasks are scheduled first among those ready.
+            pure: fn has no side effects, so an Orchestrator that already ran it
+                  skips it on later runs instead of calling it again.
+                  Static tasks only; dynamic tasks must run to register branches.
 
         Returns:
             task_id
 
+        Raises:
+            ValueError: If cost/selectivity are out of range or a dynamic task is marked pure
+
         Examples:
             # static task
             t_load = wf.task(load)
@@ -33,49 +103,406 @@ class Workflow:
 
             # Dynamic task (branching)
             t_eval = wf.task(evaluate, possible_branches=[process_high, process_low])
+
+            # Cheap filter that drops most records: runs ahead of other ready tasks
+            t_filter = wf.task(filter_rows, cost=0.5, selectivity=0.1)
+
+            # Side-effect free lookup, skipped on repeat runs by the same Orchestrator
+            t_dims = wf.task(load_dimensions, pure=True)
         """
+        self._before_mutation()
         if constraints is None:
             constraints = []
+        _check_hints(fn.__name__, cost, selectivity)
+        if pure and possible_branches is not None:
+            raise ValueError(f"Dynamic task '{fn.__name__}' cannot be pure: it must run to register branches")
 
         if possible_branches is None:
             # Static task - wrap to hide ctx
-            task_id = str(uuid.uuid4())
-
-            # Only register wrapper if not already registered
-            if not has(fn.__name__):
-                user_fn = fn
-                def wrapper(_):  # _ == ctx which is unused in static
-                    return user_fn()
-                register(fn.__name__, wrapper)
-
-            self._tasks[task_id] = TaskSpec(
+            task_id = self._new_id()
+            self._add_spec(TaskSpec(
                 task_id=task_id,
                 func_ref=fn.__name__,
                 deps=[],
-                constraints=constraints
-            )
+                constraints=constraints,
+                cost=cost,
+                selectivity=selectivity,
+                pure=pure,
+                fn=self._register_static(fn)
+            ))
             return task_id
         else:
             # Dynamic task
-            return self._create_dynamic_task(fn, possible_branches, constraints=constraints)
+            return self._create_dynamic_task(fn, possible_branches, constraints=constraints,
+                                             cost=cost, selectivity=selectivity)
+
+    def link(self, upstream_id: int, downstream_id: int):
+        """
+        Defines downstream task id depends on upstream task id.
+        Linking the same pair twice is a no-op.
+
+        Raises:
+            ValueError: If the edge would create a cycle
+        """
+        self._before_mutation()
+        spec = self._tasks[downstream_id]
+        if upstream_id in spec.deps_set:
+            return
+        if self._order[upstream_id] >= self._order[downstream_id]:
+            self._reorder(upstream_id, downstream_id)
+        spec.deps_set.add(upstream_id)
+        spec.deps.append(upstream_id)
+        self._children[upstream_id].append(downstream_id)
+
+    def _reorder(self, upstream_id: int, downstream_id: int):
+        """Internal: Restore topological ranks before adding an edge that points backwards.
+
+        Pearce-Kelly: only tasks ranked between downstream and upstream can be
+        affected. Walk forward from downstream and backward from upstream inside
+        that window, then hand the ranks they held to the backward set first.
+
+        Raises:
+            ValueError: If upstream is reachable from downstream (cycle)
+        """
+        order = self._order
+        lower, upper = order[downstream_id], order[upstream_id]
+
+        forward: List[int] = []
+        seen = {downstream_id}
+        stack = [downstream_id]
+        while stack:
+            tid = stack.pop()
+            if tid == upstream_id:
+                raise ValueError(
+                    f"Linking '{self._tasks[upstream_id].func_ref}' -> "
+                    f"'{self._tasks[downstream_id].func_ref}' would create a cycle"
+                )
+            forward.append(tid)
+            for child in self._children[tid]:
+                if child not in seen and order[child] <= upper:
+                    seen.add(child)
+                    stack.append(child)
+
+        backward: List[int] = []
+        seen = {upstream_id}
+        stack = [upstream_id]
+        while stack:
+            tid = stack.pop()
+            backward.append(tid)
+            for dep_id in self._tasks[tid].deps:
+                if dep_id not in seen and order[dep_id] > lower:
+                    seen.add(dep_id)
+                    stack.append(dep_id)
+
+        forward.sort(key=order.__getitem__)
+        backward.sort(key=order.__getitem__)
+        affected = backward + forward
+        ranks = sorted(order[tid] for tid in affected)
+        for tid, rank in zip(affected, ranks):
+            order[tid] = rank
+
+    def _register_static(self, fn: Callable) -> Callable:
+        """Internal: Wrap fn to hide ctx and register the wrapper, only if the name is not taken.
+
+        Returns:
+            The wrapper for fn itself, even when the registry already held another one
+        """
+        wrapper = partial(_static_wrapper, fn)
+        register_if_absent(fn.__name__, wrapper)
+        return wrapper
+
+    def _add_spec(self, spec: TaskSpec):
+        """Internal: Store a new TaskSpec and index it. Its deps and spec.fn must already exist."""
+        tid = spec.task_id
+        self._tasks[tid] = spec
+        self._by_func_ref.setdefault(spec.func_ref, tid)
+        self._children[tid] = []
+        for dep_id in spec.deps:
+            self._children[dep_id].append(tid)
+        # Ranked after everything that exists, so after its deps too
+        self._order[tid] = self._max_rank
+        self._max_rank += 1
+
+    def _before_mutation(self):
+        """Internal: Reject changes to a frozen workflow and mark derived views stale"""
+        if self._plan is not None:
+            raise RuntimeError(f"Workflow '{self.name}' is frozen and cannot be modified")
+        self._dirty = True
+        self._version += 1
+
+    def _refresh(self):
+        """Internal: Recompute dynamic task ids and the CSR views if the graph changed"""
+        if not self._dirty:
+            return
+        dynamic_task_ids: Set[int] = set()
+        for task in self._tasks.values():
+            if task.dynamic_spawns:
+                dynamic_task_ids.update(task.dynamic_spawns.values())
+        self._cached_dynamic_ids = dynamic_task_ids
+        self._csr = self._build_csr()
+        self._succ_csr = self._build_succ_csr()
+        self._topo_cache = None
+        self._plan_cache = None
+        self._dirty = False
+
+    def freeze(self) -> FrozenPlan:
+        """
+        Mark the workflow as complete and return its execution plan.
+        Further task()/link() calls raise, so the plan and children_index()
+        cannot change under an executor.
 
-    def link(self, upstream_id: str, downstream_id: str):
+        Returns:
+            FrozenPlan (the same object on repeated calls)
+        """
+        if self._plan is None:
+            self._plan = self.plan()
+        return self._plan
+
+    def plan(self) -> FrozenPlan:
+        """
+        Execution plan for the workflow as it is now, without freezing it.
+        Computed once and reused until the next task()/link()/fuse_linear_chains()
+        call, which builds a new plan rather than changing this one.
+
+        The plan lays tasks out as parallel arrays in topological order:
+        func_refs, dep counts and dynamic flags per row plus a CSR successor
+        index, so schedulers can work on integer rows (copy plan.indeg and
+        decrement it) instead of chasing TaskSpec attributes through dicts.
+
+        plan.order is a dispatch hint: a topological order that, whenever
+        several tasks are ready, picks the lowest (selectivity - 1) / cost
+        first, i.e. cheap tasks that discard the most work run early.
+
+        Returns:
+            FrozenPlan
+        """
+        self._refresh()
+        if self._plan_cache is not None:
+            return self._plan_cache
+        row = self._index
+        task_ids = tuple(row)
+        specs = [self._tasks[tid] for tid in task_ids]
+        indptr, indices = self._succ_csr  # _refresh() replaces these arrays, never edits them, so safe to share
+
+        self._plan_cache = FrozenPlan(
+            task_ids=task_ids,
+            id_of=dict(row),
+            func_refs=tuple(spec.func_ref for spec in specs),
+            indptr=indptr,
+            indices=indices,
+            indeg=array('i', [len(spec.deps) for spec in specs]),
+            dyn_mask=bytes(1 if spec.dynamic_spawns else 0 for spec in specs),
+            order=self._cost_order(specs, indptr, indices),
+        )
+        return self._plan_cache
+
+    @staticmethod
+    def _cost_order(specs: List[TaskSpec], indptr: array, indices: array) -> Tuple[int, ...]:
+        """Internal: Kahn's algorithm over plan rows, ready rows popped by (selectivity - 1) / cost"""
+        indeg = array('i', [len(spec.deps) for spec in specs])
+        rank = [(spec.selectivity - 1.0) / spec.cost for spec in specs]
+        heap = [(rank[i], i) for i in range(len(specs)) if indeg[i] == 0]
+        heapq.heapify(heap)
+        order = []
+        while heap:
+            _, i = heapq.heappop(heap)
+            order.append(i)
+            for k in range(indptr[i], indptr[i + 1]):
+                child = indices[k]
+                indeg[child] -= 1
+                if indeg[child] == 0:
+                    heapq.heappush(heap, (rank[child], child))
+        return tuple(order)
+
+    def topo_state(self) -> Dict[int, int]:
+        """
+        Fresh per-run counters of unfinished dependencies for every task.
+
+        Returns:
+            task_id -> number of deps not yet done
+        """
+        return {tid: len(spec.deps) for tid, spec in self._tasks.items()}
+
+    def children_index(self) -> Dict[int, List[int]]:
         """
-        Defines downstream task id depends on upstream task id
+        Inverse of deps: which tasks depend on each task. Kept up to date by
+        task()/link(); callers must not modify it.
+
+        Returns:
+            task_id -> list of downstream task_ids
         """
-        self._tasks[downstream_id].deps.append(upstream_id)
+        return self._children
 
-    def branched_task(self, fn: Callable, possible_branches: List[Callable]) -> str:
+    def mark_done(self, state: Dict[int, int], children: Dict[int, List[int]], tid: int) -> List[int]:
+        """
+        Record that tid finished and collect the tasks it unblocked.
+
+        Args:
+            state: Counters from topo_state(), updated in place
+            children: Mapping from children_index()
+            tid: task_id that just finished
+
+        Returns:
+            task_ids whose last outstanding dependency was tid
+        """
+        ready = []
+        for child in children[tid]:
+            state[child] -= 1
+            if state[child] == 0:
+                ready.append(child)
+        return ready
+
+    def iter_ready(self) -> Iterator[int]:
+        """
+        Yield task_ids in dependency order: every task after all of its deps.
+        Executors that run tasks concurrently should drive
+        topo_state()/mark_done() directly.
+        """
+        yield from self.topo_order()
+
+    def topo_order(self) -> Tuple[int, ...]:
+        """
+        All task_ids in the order iter_ready() yields them. Computed once and
+        reused until the next task()/link()/fuse_linear_chains() call.
+
+        link() keeps every task ranked after its deps and rejects cycles, and
+        _build_csr() lays rows out by that rank, so the row order already is a
+        topological order and no sort is needed.
+
+        Returns:
+            Tuple of task_ids
+        """
+        self._refresh()
+        if self._topo_cache is None:
+            self._topo_cache = tuple(self._index)
+        return self._topo_cache
+
+    def fuse_linear_chains(self) -> int:
+        """
+        Collapse single-producer/single-consumer edges into one task.
+
+        A task is merged into its parent when it is the parent's only child and
+        the parent is its only dep. The merged task runs both functions back to
+        back under a synthesized func_ref "parent+child", so the scheduler
+        handles one node instead of two. Dynamic tasks, dynamic spawn targets
+        and tasks with constraints are never fused. The merged task costs
+        parent.cost + child.cost and lets through parent.selectivity *
+        child.selectivity of the work.
+
+        Call after the workflow is fully linked; task_ids of fused children
+        disappear and get_task() returns the merged task for any of its parts.
+
+        Returns:
+            Number of tasks removed
+        """
+        self._refresh()
+        spawned = self._cached_dynamic_ids
+        self._before_mutation()
+        children = self.children_index()
+
+        def fusable(spec: TaskSpec) -> bool:
+            return spec.dynamic_spawns is None and not spec.constraints
+
+        # Fusing never changes another task's in/out degree, so one pass reaches the fixed point
+        fused = 0
+        for child_id in list(self._tasks):
+            child = self._tasks[child_id]
+            if len(child.deps) != 1 or child_id in spawned or not fusable(child):
+                continue
+            parent_id = child.deps[0]
+            parent = self._tasks[parent_id]
+            if len(children[parent_id]) != 1 or not fusable(parent):
+                continue
+
+            func_ref = sys.intern(f"{parent.func_ref}+{child.func_ref}")
+            parent.fn = partial(_fused_wrapper, parent.fn, child.fn)
+            register_if_absent(func_ref, parent.fn)
+            parent.func_ref = func_ref
+            parent.pure = parent.pure and child.pure
+            parent.cost += child.cost
+            parent.selectivity *= child.selectivity
+
+            # Successors of child now hang off parent
+            for succ_id in children[child_id]:
+                succ = self._tasks[succ_id]
+                succ.deps[succ.deps.index(child_id)] = parent_id
+                succ.deps_set.discard(child_id)
+                succ.deps_set.add(parent_id)
+            children[parent_id] = children.pop(child_id)
+            del self._tasks[child_id]
+            del self._order[child_id]
+            fused += 1
+
+        # Whole names first, so an unfused task keeps its entry over a fused part of the same name
+        by_ref: Dict[str, int] = {}
+        for tid, task in self._tasks.items():
+            by_ref.setdefault(task.func_ref, tid)
+        for tid, task in self._tasks.items():
+            if '+' in task.func_ref:
+                for part in task.func_ref.split('+'):
+                    by_ref.setdefault(part, tid)
+        self._by_func_ref = by_ref
+        return fused
+
+    def _new_id(self) -> int:
+        """Internal: Next task_id, a per-workflow monotonic counter"""
+        self._next_id += 1
+        return self._next_id
+
+    def _build_succ_csr(self) -> Tuple[array, array]:
+        """Internal: Pack children into CSR arrays over the rows _build_csr() assigned.
+
+        Returns:
+            (indptr, indices) where the successors of the task in row i are
+            indices[indptr[i]:indptr[i + 1]], each a row number
+        """
+        row = self._index
+        indptr = array('i', [0]) * (len(row) + 1)
+        indices = array('i', [0]) * self._csr[0][-1]  # one successor entry per dep entry
+        pos = 0
+        for i, tid in enumerate(row):
+            for child in self._children[tid]:
+                indices[pos] = row[child]
+                pos += 1
+            indptr[i + 1] = pos
+        return indptr, indices
+
+    def _build_csr(self) -> Tuple[array, array]:
+        """Internal: Pack all deps into CSR arrays, rows in topological rank order.
+
+        Returns:
+            (indptr, indices) where the deps of the task in row i are
+            indices[indptr[i]:indptr[i + 1]], each a row number (see self._index)
+        """
+        ordered = sorted(self._tasks, key=self._order.__getitem__)
+        self._index = {tid: i for i, tid in enumerate(ordered)}
+        indptr = array('i', [0]) * (len(ordered) + 1)
+        indices = array('i', [0]) * sum(len(t.deps) for t in self._tasks.values())
+
+        pos = 0
+        for i, tid in enumerate(ordered):
+            for dep_id in self._tasks[tid].deps:
+                indices[pos] = self._index[dep_id]
+                pos += 1
+            indptr[i + 1] = pos
+        return indptr, indices
+
+    def branched_task(self, fn: Callable, possible_branches: List[Callable],
+                      cost: float = 1.0, selectivity: float = 1.0) -> int:
         """
         Create a branching task that must return exactly one branch.
 
         Args:
             fn: Function that returns Callable - exactly one function to execute
             possible_branches: List of all possible functions that could be returned
+            cost, selectivity: Scheduling hints, see task()
 
         Returns:
             task_id
 
+        Raises:
+            ValueError: If cost/selectivity are out of range
+
         Example:
             def evaluate():
                 if value > 10:
@@ -85,9 +512,11 @@ class Workflow:
 
             t_eval = wf.branched_task(evaluate, [process_high, process_low])
         """
-        return self._create_dynamic_task(fn, possible_branches, branching=True)
+        _check_hints(fn.__name__, cost, selectivity)
+        return self._create_dynamic_task(fn, possible_branches, branching=True,
+                                         cost=cost, selectivity=selectivity)
 
-    def get_task(self, fn: Callable) -> Optional[str]:
+    def get_task(self, fn: Callable) -> Optional[int]:
         """
         Get task_id for a given function.
 
@@ -97,13 +526,11 @@ class Workflow:
         Returns:
             task_id if found, None otherwise
         """
-        for tid, spec in self._tasks.items():
-            if spec.func_ref == fn.__name__:
-                return tid
-        return None
+        return self._by_func_ref.get(fn.__name__)
 
     def _create_dynamic_task(self, fn: Callable, possible_branches: List[Callable],
-                             branching: bool = False, constraints: Optional[List[Constraint]] = None) -> str:
+                             branching: bool = False, constraints: Optional[List[Constraint]] = None,
+                             cost: float = 1.0, selectivity: float = 1.0) -> int:
         """Internal: Create a task that dynamically spawns other tasks
 
         Args:
@@ -111,58 +538,42 @@ class Workflow:
             possible_branches: List of possible branch functions
             branching: If True, enforce exactly one branch returned
             constraints: Optional list of constraints to validate at runtime
+            cost, selectivity: Scheduling hints, see task()
         """
+        self._before_mutation()
         if constraints is None:
             constraints = []
         # Register all possible branch tasks
+        name = sys.intern(fn.__name__)
+        by_ref = self._by_func_ref
         branch_map = {}
+        label_of: Dict[int, Tuple[Callable, str]] = {}  # id(fn) -> (fn, label), no user __hash__ involved
         for branch_fn in possible_branches:
-            # Check if already registered
-            existing_id = None
-            for tid, spec in self._tasks.items():
-                if spec.func_ref == branch_fn.__name__:
-                    existing_id = tid
-                    break
-
-            if existing_id:
-                branch_map[branch_fn.__name__] = existing_id
-            else:
-                branch_id = self.task(branch_fn)
-                branch_map[branch_fn.__name__] = branch_id
-
-        # Wrapper that calls user function and registers branches
-        user_fn = fn
-        is_branching = branching
-        def wrapper(ctx):
-            result = user_fn()
-            # Handle both single function and list of functions
-            to_register = result if isinstance(result, list) else [result]
-
-            # Enforce branching constraint: exactly one branch
-            if is_branching and len(to_register) != 1:
-                raise RuntimeError(
-                    f"Branching task '{fn.__name__}' must return exactly one branch, "
-                    f"but returned {len(to_register)} branches"
-                )
-
-            branch_labels = [branch_fn.__name__ for branch_fn in to_register]
-            ctx.register_branches(branch_labels)
-
-        # Register wrapper only if not already registered
-        task_id = str(uuid.uuid4())
-        from func_registry import has
-        if not has(fn.__name__):
-            register(fn.__name__, wrapper)
-        self._tasks[task_id] = TaskSpec(
+            branch_name = sys.intern(branch_fn.__name__)
+            label_of[id(branch_fn)] = (branch_fn, branch_name)
+            # Reuse the task if one was already registered for this function
+            existing_id = by_ref.get(branch_name)
+            branch_map[branch_name] = existing_id if existing_id else self.task(branch_fn)
+
+        # Register wrapper that calls user function and registers branches, only if not already registered
+        task_id = self._new_id()
+        wrapper = partial(_dynamic_wrapper, fn, name, branching, label_of)
+        register_if_absent(name, wrapper)
+        self._add_spec(TaskSpec(
             task_id=task_id,
-            func_ref=fn.__name__,
+            func_ref=name,
             deps=[],
             dynamic_spawns=branch_map,
-            constraints=constraints
-        )
+            constraints=constraints,
+            cost=cost,
+            selectivity=selectivity,
+            fn=wrapper
+        ))
         return task_id
 
-    def map_reduce(self, mapper: Callable, reducer: Callable, count: int) -> str:
+    def map_reduce(self, mapper: Callable, reducer: Callable, count: int,
+                   mapper_cost: float = 1.0, mapper_selectivity: float = 1.0,
+                   reducer_cost: float = 1.0, reducer_selectivity: float = 1.0) -> int:
         """
         Create map-reduce pattern: mapper_initiator → N mappers → 1 reducer
 
@@ -170,10 +581,15 @@ class Workflow:
             mapper: Function executed count times in parallel
             reducer: Function executed after all mappers complete
             count: Number of mapper instances
+            mapper_cost, mapper_selectivity: Scheduling hints for each mapper, see task()
+            reducer_cost, reducer_selectivity: Scheduling hints for the reducer
 
         Returns:
             task_id of mapper_initiator (entry point for linking upstream tasks)
 
+        Raises:
+            ValueError: If any cost/selectivity is out of range
+
         Example:
             def mapper():
                 print("MAPPING")
@@ -185,23 +601,24 @@ class Workflow:
             # Creates: mapper_initiator → 5 parallel mappers → 1 reducer
             wf.link(upstream_task, mr_id)  # Links to mapper_initiator
         """
+        _check_hints(mapper.__name__, mapper_cost, mapper_selectivity)
+        _check_hints(reducer.__name__, reducer_cost, reducer_selectivity)
+
         # Create mapper initiator (no-op entry point)
         mapper_initiator_id = self.task(lambda: None)
 
-        # Create count mapper tasks
-        mapper_ids = []
-        for i in range(count):
-            mapper_id = self.task(mapper)
-            mapper_ids.append(mapper_id)
-            # Link mapper_initiator → mapper
-            self.link(mapper_initiator_id, mapper_id)
-
-        # Create reducer task
-        reducer_id = self.task(reducer)
-
-        # Link all mappers → reducer
+        # Create count mapper tasks sharing one wrapper, each depending on mapper_initiator
+        mapper_fn = self._register_static(mapper)
+        mapper_ref = mapper.__name__
+        mapper_ids = [self._new_id() for _ in range(count)]
         for mapper_id in mapper_ids:
-            self.link(mapper_id, reducer_id)
+            self._add_spec(TaskSpec(task_id=mapper_id, func_ref=mapper_ref, deps=[mapper_initiator_id],
+                                    fn=mapper_fn, cost=mapper_cost, selectivity=mapper_selectivity))
+
+        # Create reducer task depending on all mappers in one shot; the id list is handed over, not copied
+        reducer_id = self._new_id()
+        self._add_spec(TaskSpec(task_id=reducer_id, func_ref=reducer.__name__, deps=mapper_ids,
+                                fn=self._register_static(reducer), cost=reducer_cost, selectivity=reducer_selectivity))
 
         return mapper_initiator_id
 
@@ -214,7 +631,7 @@ class Workflow:
             view: If True, open the generated image automatically
 
         Returns:
-            graphviz.Digraph object
+            graphviz.Source object
 
         Notes:
             - Solid edges: static dependencies
@@ -226,44 +643,54 @@ class Workflow:
         except ImportError:
             raise ImportError("graphviz package required. Install with: pip install graphviz")
 
-        # Collect all dynamically spawned task IDs
-        dynamic_task_ids: Set[str] = set()
-        for task in self._tasks.values():
-            if task.dynamic_spawns:
-                dynamic_task_ids.update(task.dynamic_spawns.values())
+        # Dynamically spawned task IDs and the CSR view are cached until the next mutation
+        self._refresh()
+        dynamic_task_ids = self._cached_dynamic_ids
 
-        # Create directed graph
-        dot = graphviz.Digraph(comment=self.name)
-        dot.attr(rankdir='TB')  # Top to bottom layout
+        # DOT source is written straight into one buffer instead of per-call Digraph.node/edge
+        style_static = 'shape=box, style=rounded'
+        style_dyn = 'shape=box, style="rounded,dashed", color=blue'
+        style_spawner = 'shape=diamond, style=filled, fillcolor=lightblue'  # Task that spawns dynamic branches
 
-        # Add nodes
+        # One pass decides each node's (quoted label, style); labels repeat, so quote each once
+        quoted: Dict[str, str] = {}
+        labels: Dict[int, Tuple[str, str]] = {}
         for task_id, task in self._tasks.items():
-            label = task.func_ref
-            if task_id in dynamic_task_ids:
-                label += "\n(dynamic)"
-
-            # Style dynamic tasks differently
             if task_id in dynamic_task_ids:
-                dot.node(task_id, label, shape='box', style='rounded,dashed', color='blue')
+                label, style = task.func_ref + "\n(dynamic)", style_dyn
             elif task.dynamic_spawns:
-                # Task that spawns dynamic branches
-                dot.node(task_id, label, shape='diamond', style='filled', fillcolor='lightblue')
+                label, style = task.func_ref, style_spawner
             else:
-                dot.node(task_id, label, shape='box', style='rounded')
+                label, style = task.func_ref, style_static
+            if label not in quoted:
+                quoted[label] = _dot_quote(label)
+            labels[task_id] = (quoted[label], style)
+
+        buf = io.StringIO()
+        buf.write(f'digraph {_dot_quote(self.name)} {{\n  rankdir=TB;\n')  # Top to bottom layout
+
+        # Add nodes
+        for task_id, (label, style) in labels.items():
+            buf.write(f'  t{task_id} [label={label}, {style}];\n')
 
         # Add edges
-        for task_id, task in self._tasks.items():
+        indptr, indices = self._csr
+        task_ids = list(self._index)  # CSR row order
+        for i, task_id in enumerate(task_ids):
+            task = self._tasks[task_id]
             # 1. Draw solid edges for regular dependencies (compile-time)
-            for dep_id in task.deps:
-                dot.edge(dep_id, task_id)
+            for k in range(indptr[i], indptr[i + 1]):
+                buf.write(f'  t{task_ids[indices[k]]} -> t{task_id};\n')
 
             # 2. Draw dotted edges for dynamic spawns (runtime-conditional)
             if task.dynamic_spawns:
                 for spawn_label, spawn_id in task.dynamic_spawns.items():
-                    dot.edge(task_id, spawn_id, style='dotted', color='blue',
-                            label=spawn_label)
+                    buf.write(f'  t{task_id} -> t{spawn_id} '
+                              f'[style=dotted, color=blue, label={_dot_quote(spawn_label)}];\n')
+        buf.write('}\n')
 
         # Render to file
+        dot = graphviz.Source(buf.getvalue())
         dot.render(filename, format='png', cleanup=True, view=view)
 
-        return dot 
+        return dot
@@ -2,13 +2,19 @@ from typing import Callable, Dict
 
 _REGISTRY: Dict[str, Callable] = {}
 
-def register(ref: str, fn: Callable):
-    if ref in _REGISTRY and _REGISTRY[ref] is not fn:
+def register(ref: str, fn: Callable, _registry: Dict[str, Callable] = _REGISTRY):
+    existing = _registry.get(ref)
+    if existing is not None and existing is not fn:
         raise ValueError(f"Function ref '{ref}' already registered to a different function.")
-    _REGISTRY[ref] = fn
+    _registry[ref] = fn
 
-def get(ref: str) -> Callable:
-    return _REGISTRY[ref]
+def register_if_absent(ref: str, fn: Callable, _registry: Dict[str, Callable] = _REGISTRY) -> bool:
+    """Register fn unless ref is already taken. One dict probe; True if fn was stored."""
+    return _registry.setdefault(ref, fn) is fn
 
-def has(ref: str) -> bool:
-    return ref in _REGISTRY
+def get(ref: str, _registry: Dict[str, Callable] = _REGISTRY) -> Callable:
+    # _registry is bound at definition time so the lookup skips the module-global probe
+    return _registry[ref]
+
+def has(ref: str, _registry: Dict[str, Callable] = _REGISTRY) -> bool:
+    return ref in _registry
@@ -1,14 +1,27 @@
-from typing import Dict, List, Optional, Any
-from collections import defaultdict, deque
-from client.workflow import Workflow  # in practice would be serialized and sent over proto
+import asyncio
+import heapq
+import os
+import sys
+import weakref
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from wf_types import TaskSpec, StaticConstraint, NoOutgoingEdgesConstraint, NoIncomingEdgesConstraint
 from func_registry import get as registry_get  # In practice would be done through a DB
 
+if TYPE_CHECKING:  # only needed for annotations, keeps the client stack off the server import path
+    from client.workflow import Workflow  # in practice would be serialized and sent over proto
+
+# Task failures re-raise the original exception with a note rather than wrapping it
+_HAS_ADD_NOTE = sys.version_info >= (3, 11)
+
 
 class ExecutionContext:
     """Context passed to tasks to register which branches should execute at runtime"""
 
-    def __init__(self, orchestrator: 'Orchestrator', current_task_id: str, task_spec: TaskSpec):
+    __slots__ = ('_orchestrator', '_current_task_id', '_task_spec', '_registered_branches')
+
+    def __init__(self, orchestrator: 'Orchestrator', current_task_id: int, task_spec: TaskSpec):
         self._orchestrator = orchestrator
         self._current_task_id = current_task_id
         self._task_spec = task_spec
@@ -39,81 +52,202 @@ class ExecutionContext:
         return self._registered_branches
 
 class DependencyResolver:
-    def __init__(self, wf: Workflow):
-        self.task_index: Dict[str, TaskSpec] = dict(wf._tasks)  # id -> spec
-        self.graph = defaultdict(list)
-        self.indegree = defaultdict(int)
+    """
+    Read-only view of a workflow for one run, built on the workflow's plan
+    (Workflow.plan()). Tasks are the plan's rows, numbered 0..n-1 in
+    topological order, and the graph is the plan's CSR successor index:
+    successors of row i are succ_flat[succ_offsets[i]:succ_offsets[i + 1]].
+    The public methods keep speaking task ids; rows are for the scheduler.
+    """
+
+    def __init__(self, wf: 'Workflow'):
+        plan = wf.plan()
+        self.task_index: Dict[int, TaskSpec] = dict(wf._tasks)  # id -> spec
+        self.task_ids: Tuple[int, ...] = plan.task_ids  # row -> id
+        self.id_to_idx: Dict[int, int] = plan.id_of
+        self._all_tasks: Tuple[TaskSpec, ...] = tuple(self.task_index[tid] for tid in self.task_ids)  # row -> spec
+        self._n = n = len(self._all_tasks)
+        # Resolve every task's callable once up front so dispatch is a direct call.
+        # Workflow caches it on the spec; the registry is only the fallback
+        self.fn_of: List[Callable] = [
+            t.fn if t.fn is not None else self._resolve(t) for t in self._all_tasks
+        ]
+
+        # Tasks named in someone's dynamic_spawns; these only run once registered at runtime
+        self.spawn_targets = set()
+        for t in self._all_tasks:
+            if t.dynamic_spawns:
+                self.spawn_targets.update(t.dynamic_spawns.values())
+        self.spawn_mask = bytearray(n)
+        for tid in self.spawn_targets:
+            self.spawn_mask[self.id_to_idx[tid]] = 1
+
+        # Shared with the plan, never written: the orchestrator copies indegree per run
+        self.indegree: array = plan.indeg
+        self.succ_offsets: array = plan.indptr
+        self.succ_flat: array = plan.indices
+        offsets, flat = self.succ_offsets, self.succ_flat
+
+        # plan.order is topological, so both passes below are single sweeps over it
+        self._order = plan.order
+
+        # Longest path to a leaf; the scheduler runs critical-path tasks first
+        self.bottom_level = self._compute_bottom_levels()
+
+        # Ready rows leave the heap by dispatch_rank: highest bottom level first, ties
+        # in plan.order, i.e. cheap selective tasks first
+        self.dispatch_rank = self._compute_dispatch_rank()
 
         # Compute all dynamically spawnable tasks (including transitive)
-        self.dynamic_only_tasks = self._compute_dynamic_only_tasks()
+        self.dynamic_only_mask = self._compute_dynamic_only_mask()
+        self.dynamic_only_tasks = {self.task_ids[i] for i in range(n) if self.dynamic_only_mask[i]}
+
+        # chain_next[u] = v when v is u's only successor and u is v's only dep, else -1.
+        # Dynamic-only v are left out: they still have to wait to be registered
+        self.chain_next = array('i', [-1]) * n
+        for u in range(n):
+            lo = offsets[u]
+            if offsets[u + 1] - lo == 1:
+                v = flat[lo]
+                if self.indegree[v] == 1 and not self.dynamic_only_mask[v]:
+                    self.chain_next[u] = v
+
+        # 0 indegree and not dynamically spawned; fixed for the life of the resolver
+        self.initial_ready_rows: List[int] = [
+            i for i in range(n) if self.indegree[i] == 0 and not self.dynamic_only_mask[i]
+        ]
+
+        self._validate_constraints()
+
+    @staticmethod
+    def _resolve(task: TaskSpec) -> Callable:
+        """
+        Internal: Look up a task's function in the registry before anything runs.
+
+        Raises:
+            RuntimeError: If func_ref was never registered
+        """
+        try:
+            return registry_get(task.func_ref)
+        except KeyError:
+            raise RuntimeError(f"Task '{task.func_ref}' has no registered function") from None
 
-        for t in self.task_index.values():
-            for d in t.deps:
-                self.graph[d].append(t.task_id)
-                self.indegree[t.task_id] += 1
+    def _validate_constraints(self):
+        """
+        Internal: Validate every task's constraints once per workflow.
+        All current constraints are structural, so nothing needs re-checking per dispatch.
+
+        Raises:
+            RuntimeError: If any constraint is violated
+        """
+        validator = ConstraintValidator(self)
+        for t in self._all_tasks:
+            if t.constraints:
+                validator.validate_before_execution(t)
 
-    def _compute_dynamic_only_tasks(self) -> set:
+    def _compute_bottom_levels(self) -> array:
         """
-        Compute tasks that can only run if dynamically spawned.
+        Internal: Compute bottomL(v) per row, the number of edges on the longest path
+        from v to any leaf (0 for leaves), by walking plan.order in reverse.
+        Tasks on a cycle are missing from plan.order and stay at 0; the
+        orchestrator reports those as a deadlock.
+        """
+        offsets, flat = self.succ_offsets, self.succ_flat
+        bottom_level = array('i', bytes(4 * self._n))
+        for u in reversed(self._order):
+            lo, hi = offsets[u], offsets[u + 1]
+            if lo != hi:
+                bottom_level[u] = 1 + max(bottom_level[v] for v in flat[lo:hi])
+        return bottom_level
+
+    def _compute_dispatch_rank(self) -> array:
+        """Internal: Per row, its position when sorted by (-bottom_level, position in plan.order)"""
+        n, bottom_level = self._n, self.bottom_level
+        position = array('i', range(n, 2 * n))  # rows on a cycle sort after the rest
+        for k, u in enumerate(self._order):
+            position[u] = k
+        rank = array('i', bytes(4 * n))
+        for r, u in enumerate(sorted(range(n), key=lambda u: (-bottom_level[u], position[u]))):
+            rank[u] = r
+        return rank
+
+    def _compute_dynamic_only_mask(self) -> bytearray:
+        """
+        Compute tasks that can only run if dynamically spawned, as a per-row mask.
         Includes both direct (in dynamic_spawns) and transitive
         (depends only on dynamic-only tasks).
         """
-        dynamic_only = set()
+        dynamic_only = bytearray(self.spawn_mask)
 
-        # Direct: tasks in someone's dynamic_spawns
-        for t in self.task_index.values():
-            if t.dynamic_spawns:
-                dynamic_only.update(t.dynamic_spawns.values())
-
-        # Transitive: tasks whose ALL dependencies are dynamic
-        changed = True
-        while changed:
-            changed = False
-            for t in self.task_index.values():
-                if t.task_id in dynamic_only:
-                    continue
-                if not t.deps:
-                    continue
-                # If ALL deps are dynamic-only, this task is too
-                if all(dep in dynamic_only for dep in t.deps):
-                    dynamic_only.add(t.task_id)
-                    changed = True
+        # Static workflow: nothing can be spawned, skip the propagation
+        if not self.spawn_targets:
+            return dynamic_only
+
+        # Transitive: tasks whose ALL dependencies are dynamic. In topological order
+        # every dep is settled before the task itself, so one sweep is enough
+        id_to_idx, specs = self.id_to_idx, self._all_tasks
+        for v in self._order:
+            if dynamic_only[v]:
+                continue
+            deps = specs[v].deps
+            if deps and all(dynamic_only[id_to_idx[dep]] for dep in deps):
+                dynamic_only[v] = 1
 
         return dynamic_only
 
-    def tasks(self):
-        return list(self.task_index.values())
+    def tasks(self) -> Tuple[TaskSpec, ...]:
+        return self._all_tasks
+
+    @property
+    def task_count(self) -> int:
+        """Number of tasks in the workflow, measured once at construction"""
+        return self._n
 
-    def initial_ready(self) -> List[str]:
+    def initial_ready(self) -> List[int]:
         """Return tasks that are ready to execute initially 
         0 indegrees and not dynamically spawned"""
-        return [
-            t.task_id for t in self.task_index.values()
-            if self.indegree[t.task_id] == 0 and t.task_id not in self.dynamic_only_tasks
-        ]
+        return [self.task_ids[i] for i in self.initial_ready_rows]
 
-    def successors(self, task_id: str) -> List[str]:
-        return self.graph[task_id]
+    def successors(self, task_id: int) -> Tuple[int, ...]:
+        i = self.id_to_idx.get(task_id)
+        if i is None:
+            return ()
+        return tuple(self.task_ids[j] for j in self.succ_flat[self.succ_offsets[i]:self.succ_offsets[i + 1]])
 
-    def task_of(self, task_id: str) -> TaskSpec:
+    def task_of(self, task_id: int) -> TaskSpec:
         return self.task_index[task_id]
 
 
-class Scheduler:
-    def __init__(self):
-        self.q: deque[str] = deque()
-
-    def add_ready(self, task_ids: List[str]): 
-        self.q.extend(task_ids)
-
-    def next(self) -> Optional[str]:
-        return self.q.popleft() if self.q else None
-
-
 class Executor:
-    def execute(self, func_ref: str, ctx: ExecutionContext):
-        fn = registry_get(func_ref)
-        return fn(ctx)
+    def __init__(self, pool: Optional[ThreadPoolExecutor] = None,
+                 completed_pure: Optional['weakref.WeakSet[Callable]'] = None):
+        self.pool = pool  # None = the event loop's default pool
+        # Callables of pure tasks that already ran; nothing reads task results, so only the fact is kept.
+        # Weak, so a dropped workflow's callables (and the user functions they wrap) can be collected
+        self.completed_pure: 'weakref.WeakSet[Callable]' = \
+            weakref.WeakSet() if completed_pure is None else completed_pure
+
+    async def execute(self, fn: Callable, ctx: ExecutionContext):
+        # Pure tasks take no inputs, so running the same callable again changes nothing
+        pure = ctx._task_spec.pure
+        if pure and fn in self.completed_pure:
+            return None
+
+        # User code may block, so it runs on a worker thread and the event loop keeps scheduling
+        result = await asyncio.get_running_loop().run_in_executor(self.pool, fn, ctx)
+        if pure:
+            self.completed_pure.add(fn)
+        return result
+
+    def call(self, fn: Callable, ctx: ExecutionContext):
+        """Run fn on the calling thread, skipping pure tasks that already ran like execute()"""
+        pure = ctx._task_spec.pure
+        if pure and fn in self.completed_pure:
+            return None
+        result = fn(ctx)
+        if pure:
+            self.completed_pure.add(fn)
+        return result
 
 
 class ConstraintValidator:
@@ -132,13 +266,11 @@ class ConstraintValidator:
         Raises:
             RuntimeError: If any constraint is violated
         """
+        dispatch = self._DISPATCH
         for constraint in task.constraints:
-            if isinstance(constraint, StaticConstraint):
-                self._validate_static(task)
-            elif isinstance(constraint, NoOutgoingEdgesConstraint):
-                self._validate_no_outgoing_edges(task)
-            elif isinstance(constraint, NoIncomingEdgesConstraint):
-                self._validate_no_incoming_edges(task)
+            check = dispatch.get(type(constraint))
+            if check is not None:
+                check(self, task)
 
     def _validate_static(self, task: TaskSpec):
         """
@@ -191,18 +323,37 @@ class ConstraintValidator:
                 f"but has incoming edges from: {dep_names}"
             )
 
+    # Constraint type -> check, one dict probe per constraint instead of an isinstance chain
+    _DISPATCH: Dict[type, Callable[['ConstraintValidator', TaskSpec], None]] = {
+        StaticConstraint: _validate_static,
+        NoOutgoingEdgesConstraint: _validate_no_outgoing_edges,
+        NoIncomingEdgesConstraint: _validate_no_incoming_edges,
+    }
 
-class Orchestrator:
-    def __init__(self):
-        self.resolver: Optional[DependencyResolver] = None
-        self.sched: Optional[Scheduler] = None
-        self.indegree: Dict[str, int] = {}
-        self.done: Dict[str, str] = {}
-        self.blocked_branches: Dict[str, int] = {}  # task_id -> actual indegree (saved for later)
-
-    def _register_branches_for_execution(self, ctx: ExecutionContext):
+
+class _RunState:
+    """
+    Internal: Mutable bookkeeping of one run over a (shared, read-only) resolver.
+    Each run gets its own, so concurrent run_async() calls on one Orchestrator
+    don't see each other's counters.
+    """
+
+    __slots__ = ('resolver', 'indegree', 'done', 'ready', 'blocked', 'remaining')
+
+    def __init__(self, resolver: DependencyResolver):
+        self.resolver = resolver
+        self.indegree = array('i', resolver.indegree)  # per resolver row
+        self.done: Dict[int, str] = {}
+        self.remaining = resolver.task_count - len(resolver.dynamic_only_tasks)  # non-dynamic tasks left
+        # Per row: dynamic-only and not yet registered; indegree stays live while blocked
+        self.blocked = bytearray(resolver.dynamic_only_mask)
+        dispatch_rank = resolver.dispatch_rank
+        self.ready: List[Tuple[int, int]] = [(dispatch_rank[i], i) for i in resolver.initial_ready_rows]
+        heapq.heapify(self.ready)  # heap of (dispatch_rank, row) ready to dispatch
+
+    def register_branches(self, ctx: ExecutionContext):
         """
-        Enable registered branches for execution by restoring their actual indegree.
+        Enable registered branches for execution by unblocking them.
         Called after a dynamic task completes.
 
         Args:
@@ -218,85 +369,257 @@ class Orchestrator:
                 # Already executed, skip
                 continue
 
-            # Restore actual indegree (unblock the branch)
-            if task_id in self.blocked_branches:
-                self.indegree[task_id] = self.blocked_branches[task_id]
+            # Unblock the branch (once, even if several spawners register it)
+            row = self.resolver.id_to_idx[task_id]
+            if self.blocked[row]:
+                self.unblock(row)
 
-                # Check if ready to execute
-                if self.indegree[task_id] == 0:
-                    self.sched.add_ready([task_id])
+    def unblock(self, row: int):
+        """Unblock a task (by resolver row) and queue it if nothing is outstanding"""
+        self.blocked[row] = 0
 
-    def run(self, workflow: Workflow) -> Dict[str, str]:
-        self.resolver = DependencyResolver(workflow)
-        self.sched = Scheduler()
-        exec_ = Executor()
+        # Check if ready to execute
+        if self.indegree[row] == 0:
+            heapq.heappush(self.ready, (self.resolver.dispatch_rank[row], row))
 
-        self.indegree = dict(self.resolver.indegree)
-        self.done = {}
-        self.blocked_branches = {}
+    def drain_ready(self, slots: int) -> Iterator[int]:
+        """Pop up to slots queued rows, best dispatch_rank first; the rest stay queued"""
+        ready, pop = self.ready, heapq.heappop
+        while ready and slots > 0:
+            slots -= 1
+            yield pop(ready)[1]
 
-        # Block all dynamic-only tasks (infinite indegree) until registered at runtime
-        for task_id in self.resolver.dynamic_only_tasks:
-            # Save actual indegree for later restoration
-            self.blocked_branches[task_id] = self.indegree.get(task_id, 0)
-            # Block by setting to infinity
-            self.indegree[task_id] = float('inf')
+    def finish(self, i: int, ctx: ExecutionContext) -> int:
+        """
+        Record that row i succeeded and release its successors.
 
-        self.sched.add_ready(self.resolver.initial_ready())
+        Returns:
+            Row of a linear-chain successor that is now ready but was NOT queued,
+            so the caller can start it directly; -1 otherwise
+        """
+        resolver, done, indeg = self.resolver, self.done, self.indegree
+        done[ctx._current_task_id] = "SUCCESS"
+        if not resolver.dynamic_only_mask[i]:
+            self.remaining -= 1
+        # If this task could spawn other tasks, register its branches for execution
+        if ctx._task_spec.dynamic_spawns:  # enforces that branches have to be defined
+            self.register_branches(ctx)
+
+        nxt = resolver.chain_next[i]
+        if nxt >= 0:
+            indeg[nxt] = 0
+            return nxt
+
+        offsets, flat, blocked = resolver.succ_offsets, resolver.succ_flat, self.blocked
+        for succ in flat[offsets[i]:offsets[i + 1]]:
+            indeg[succ] -= 1
+
+            # Special case where successor is blocked
+            if blocked[succ]:
+                # Spawn targets wait for register_branches. Others unblock once
+                # ALL of their dependencies are unblocked or done
+                if not resolver.spawn_mask[succ]:
+                    id_to_idx = resolver.id_to_idx
+                    all_deps_ready = all(
+                        dep in done or not blocked[id_to_idx[dep]]
+                        for dep in resolver.tasks()[succ].deps
+                    )
+                    if all_deps_ready:
+                        self.unblock(succ)
+                continue
 
-        # TOPO SORT
-        while True:
-            tid = self.sched.next()
-            if tid is None:
-                # Check if we're truly done
-                pending = [t for t in self.resolver.tasks() if t.task_id not in self.done]
-
-                # Filter out tasks that were never registered (unused dynamic tasks)
-                pending_non_dynamic = [
-                    t for t in pending
-                    if t.task_id not in self.resolver.dynamic_only_tasks
-                ]
-
-                if not pending_non_dynamic:
-                    # Only dynamic-only tasks remain, workflow complete
-                    break
+            # Normal continue on topo sort
+            if indeg[succ] == 0:
+                heapq.heappush(self.ready, (resolver.dispatch_rank[succ], succ))
+        return -1
 
-                raise RuntimeError(f"Deadlock or cycle: {[t.func_ref for t in pending_non_dynamic]}")
-
-            t = self.resolver.task_of(tid)
-            ctx = ExecutionContext(self, tid, t)  # set up context which can be called back
-
-            # Validate constraints before execution each iteration
-            validator = ConstraintValidator(self.resolver)
-            validator.validate_before_execution(t)
-
-            try:
-                exec_.execute(t.func_ref, ctx)
-                self.done[tid] = "SUCCESS"
-                # If this task could spawn other tasks, register its branches for execution
-                if t.dynamic_spawns:  # enforces that branches have to be defined
-                    self._register_branches_for_execution(ctx)
-            except Exception as e:
-                self.done[tid] = "FAILED"
-                raise RuntimeError(f"Task {t.func_ref} failed: {e}") from e
-
-            for succ in self.resolver.successors(tid):
-                # Special case where successor is now unblocked
-                if self.indegree[succ] == float('inf'):  
-                    # Check if ALL dependencies of this blocked task are now unblocked or done
-                    succ_task = self.resolver.task_of(succ)
-                    all_deps_ready = all(
-                        dep in self.done or self.indegree[dep] != float('inf')
-                        for dep in succ_task.deps
-                    )  # if all dependencies are done or have indegrees meaning has been registered 
+    def pending(self) -> List[str]:
+        """func_refs of non-dynamic tasks that have not finished, for deadlock reports"""
+        resolver, done = self.resolver, self.done
+        specs, task_ids, dynamic_only = resolver.tasks(), resolver.task_ids, resolver.dynamic_only_mask
+        return [
+            specs[i].func_ref for i in range(resolver.task_count)
+            if task_ids[i] not in done and not dynamic_only[i]
+        ]
 
-                    if all_deps_ready:
-                        # All dependencies are unblocked/done, restore actual indegree
-                        self.indegree[succ] = self.blocked_branches[succ]
 
-                # Normal continue on topo sort 
-                self.indegree[succ] -= 1
-                if self.indegree[succ] == 0:
-                    self.sched.add_ready([succ])
+class Orchestrator:
+    def __init__(self, max_concurrency: Optional[int] = None):
+        """
+        Args:
+            max_concurrency: most tasks executing at once (defaults to os.cpu_count())
+
+        Raises:
+            ValueError: If max_concurrency is less than 1
+        """
+        if max_concurrency is None:
+            max_concurrency = os.cpu_count() or 1
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+        self.max_concurrency = max_concurrency
+        self._completed_pure: 'weakref.WeakSet[Callable]' = weakref.WeakSet()  # pure tasks already run, shared across runs
+        # workflow -> (its _version when built, resolver); resolvers are read-only during a run
+        self._plan_cache: 'weakref.WeakKeyDictionary[Workflow, Tuple[int, DependencyResolver]]' = \
+            weakref.WeakKeyDictionary()
+
+    def run(self, workflow: 'Workflow') -> Dict[int, str]:
+        """
+        Execute the workflow. Up to max_concurrency tasks run at once and a
+        task's successors are released as soon as it finishes. Whenever a slot
+        frees up, the ready task with the longest remaining path takes it, so
+        the critical path never waits behind tasks that became ready earlier.
+
+        Also works where an event loop is already running (Jupyter, async web
+        handlers): the run then blocks on a helper thread. Async callers that
+        shouldn't block can await run_async() instead.
+
+        Returns:
+            task_id -> "SUCCESS" for every task that ran
+        """
+        # One slot means no parallelism for a pool or event loop to buy: call tasks inline
+        if self.max_concurrency == 1:
+            return self._run_inline(workflow, Executor(completed_pure=self._completed_pure))
+        # Checked before any coroutine exists, so nothing is left un-awaited
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return self._run_blocking(workflow)
+        # asyncio.run can't nest inside this thread's loop; give the run its own thread and loop
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="wf-run") as runner:
+            return runner.submit(self._run_blocking, workflow).result()
+
+    def _run_blocking(self, workflow: 'Workflow') -> Dict[int, str]:
+        """Internal: run() on a thread with no running event loop"""
+        with self._new_pool() as pool:
+            return asyncio.run(self._run(workflow, Executor(pool, self._completed_pure)))
+
+    async def run_async(self, workflow: 'Workflow') -> Dict[int, str]:
+        """
+        Execute the workflow on the running event loop. Same scheduling as run().
+
+        Returns:
+            task_id -> "SUCCESS" for every task that ran
+        """
+        pool = self._new_pool()
+        try:
+            return await self._run(workflow, Executor(pool, self._completed_pure))
+        finally:
+            # Don't block the caller's loop on tasks still running after a failure
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _new_pool(self) -> ThreadPoolExecutor:
+        """Internal: One worker per concurrency slot, so an admitted task never queues for a thread"""
+        return ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="wf-task")
+
+    def _resolver_for(self, workflow: 'Workflow') -> DependencyResolver:
+        """Internal: Reuse the resolver from an earlier run unless the workflow changed since"""
+        cached = self._plan_cache.get(workflow)
+        if cached is not None and cached[0] == workflow._version:
+            return cached[1]
+        resolver = DependencyResolver(workflow)
+        self._plan_cache[workflow] = (workflow._version, resolver)
+        return resolver
+
+    def _run_inline(self, workflow: 'Workflow', exec_: Executor) -> Dict[int, str]:
+        """Internal: run() for max_concurrency == 1, same dispatch order as _run without the event loop"""
+        state = _RunState(self._resolver_for(workflow))
+        resolver, ready, pop = state.resolver, state.ready, heapq.heappop
+        task_ids, specs, fn_of = resolver.task_ids, resolver.tasks(), resolver.fn_of
+        dispatch_rank = resolver.dispatch_rank
 
-        return self.done
+        while True:
+            if not ready:
+                if not state.remaining:
+                    break
+                raise RuntimeError(f"Deadlock or cycle: {state.pending()}")
+
+            i = pop(ready)[1]
+            while i >= 0:
+                ctx = ExecutionContext(self, task_ids[i], specs[i])
+                try:
+                    exec_.call(fn_of[i], ctx)
+                except Exception as e:
+                    raise self._task_failed(state, ctx, e)
+
+                # Linear chain: run the successor next unless a better-ranked task is queued
+                nxt = state.finish(i, ctx)
+                if nxt >= 0 and ready and ready[0][0] < dispatch_rank[nxt]:
+                    heapq.heappush(ready, (dispatch_rank[nxt], nxt))
+                    nxt = -1
+                i = nxt
+
+        return state.done
+
+    @staticmethod
+    def _task_failed(state: _RunState, ctx: ExecutionContext, e: Exception) -> Exception:
+        """
+        Internal: Mark a task FAILED and return what to raise: the original exception
+        with a note naming the task, or a RuntimeError wrapping it before Python 3.11.
+        """
+        state.done[ctx._current_task_id] = "FAILED"
+        func_ref = ctx._task_spec.func_ref
+        if _HAS_ADD_NOTE:
+            e.add_note(f"Task {func_ref} failed")
+            return e
+        error = RuntimeError(f"Task {func_ref} failed: {e}")
+        error.__cause__ = e
+        return error
+
+    async def _run(self, workflow: 'Workflow', exec_: Executor) -> Dict[int, str]:
+        state = _RunState(self._resolver_for(workflow))
+        resolver, ready = state.resolver, state.ready
+        inflight: Dict[asyncio.Task, Tuple[int, ExecutionContext]] = {}
+
+        # Hoisted out of the hot loop below. The loop works on rows; task ids
+        # only appear at the edges (contexts, done, error messages)
+        task_ids, specs, fn_of = resolver.task_ids, resolver.tasks(), resolver.fn_of
+        dispatch_rank = resolver.dispatch_rank
+        max_concurrency = self.max_concurrency
+
+        def dispatch(i: int):
+            ctx = ExecutionContext(self, task_ids[i], specs[i])  # set up context which can be called back
+            inflight[asyncio.create_task(exec_.execute(fn_of[i], ctx))] = (i, ctx)
+
+        try:
+            # TOPO SORT
+            while True:
+                # Fill the free slots only. Whatever stays queued is ranked again against
+                # tasks released later, so a critical-path task can still overtake it
+                for i in state.drain_ready(max_concurrency - len(inflight)):
+                    dispatch(i)
+
+                if not inflight:
+                    # Check if we're truly done. Dynamic-only tasks that were never
+                    # registered are allowed to remain
+                    if not state.remaining:
+                        break
+                    raise RuntimeError(f"Deadlock or cycle: {state.pending()}")
+
+                # Wait for any task to finish, then release its successors
+                finished, _ = await asyncio.wait(inflight, return_when=asyncio.FIRST_COMPLETED)
+                for fut in finished:
+                    i, ctx = inflight.pop(fut)
+                    try:
+                        fut.result()
+                    except Exception as e:
+                        raise self._task_failed(state, ctx, e)
+
+                    # Linear chain: the only successor is now ready. Start it in the slot
+                    # just freed unless a better-ranked task is queued for that slot
+                    nxt = state.finish(i, ctx)
+                    if nxt >= 0:
+                        if len(inflight) < max_concurrency and (not ready or ready[0][0] > dispatch_rank[nxt]):
+                            dispatch(nxt)
+                        else:
+                            heapq.heappush(ready, (dispatch_rank[nxt], nxt))
+        finally:
+            # Only non-empty when the run is failing or cancelled: stop the rest, and
+            # retrieve failures that finished alongside the one being raised
+            for fut in inflight:
+                if fut.done():
+                    if not fut.cancelled():
+                        fut.exception()
+                else:
+                    fut.cancel()
+
+        return state.done
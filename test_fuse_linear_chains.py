@@ -0,0 +1,106 @@
+from client.workflow import Workflow
+from server.orchestrator import Orchestrator
+
+ran = []
+
+def step_a():
+    ran.append("a")
+
+def step_b():
+    ran.append("b")
+
+def step_c():
+    ran.append("c")
+
+def choose_high():
+    return process_high
+
+def choose_low():
+    return process_low
+
+def process_high():
+    ran.append("high")
+
+def process_high_tail():
+    ran.append("high_tail")
+
+def process_low():
+    ran.append("low")
+
+# Test 1: A linear chain collapses into one task
+print("=== Test 1: Chain fusion ===")
+wf1 = Workflow("test_chain_fusion")
+t_a = wf1.task(step_a, cost=1.0, selectivity=0.5)
+t_b = wf1.task(step_b, cost=2.0, selectivity=0.5)
+t_c = wf1.task(step_c, cost=3.0)
+wf1.link(t_a, t_b)
+wf1.link(t_b, t_c)
+
+removed = wf1.fuse_linear_chains()
+if removed == 2 and list(wf1._tasks) == [t_a]:
+    print(f"✓ Fused into one task: {wf1._tasks[t_a].func_ref}")
+else:
+    print(f"ERROR: Should have fused into one task, removed {removed}")
+
+found = [wf1.get_task(fn) for fn in (step_a, step_b, step_c)]
+if found == [t_a, t_a, t_a]:
+    print("✓ get_task resolves every fused part")
+else:
+    print(f"ERROR: Should have resolved every part to {t_a}, got {found}")
+
+fused = wf1._tasks[t_a]
+if fused.cost == 6.0 and fused.selectivity == 0.25:
+    print("✓ Fused task sums cost and multiplies selectivity")
+else:
+    print(f"ERROR: Should have cost 6.0 and selectivity 0.25, got {fused.cost} and {fused.selectivity}")
+
+ran.clear()
+Orchestrator().run(wf1)
+if ran == ["a", "b", "c"]:
+    print("✓ Fused task runs its parts in order")
+else:
+    print(f"ERROR: Should have run a, b, c, got {ran}")
+
+# Test 2: Fusion does not depend on insertion order
+print("\n=== Test 2: Reverse insertion order ===")
+wf2 = Workflow("test_reverse_fusion")
+t_c = wf2.task(step_c)
+t_b = wf2.task(step_b)
+t_a = wf2.task(step_a)
+wf2.link(t_a, t_b)
+wf2.link(t_b, t_c)
+
+removed = wf2.fuse_linear_chains()
+if removed == 2 and len(wf2._tasks) == 1:
+    print(f"✓ Fused into one task: {next(iter(wf2._tasks.values())).func_ref}")
+else:
+    print(f"ERROR: Should have fused into one task, removed {removed}")
+
+ran.clear()
+Orchestrator().run(wf2)
+if ran == ["a", "b", "c"]:
+    print("✓ Fused task runs its parts in order")
+else:
+    print(f"ERROR: Should have run a, b, c, got {ran}")
+
+# Test 3: A spawn target absorbs its only child and still runs only when spawned
+print("\n=== Test 3: Spawn-target parent ===")
+for chooser, expected in ((choose_high, ["high", "high_tail"]), (choose_low, ["low"])):
+    wf3 = Workflow("test_spawn_target_fusion")
+    t_eval = wf3.branched_task(chooser, [process_high, process_low])
+    t_high = wf3.get_task(process_high)
+    t_tail = wf3.task(process_high_tail)
+    wf3.link(t_high, t_tail)
+
+    removed = wf3.fuse_linear_chains()
+    if removed == 1 and wf3.get_task(process_high_tail) == t_high:
+        print(f"✓ {wf3._tasks[t_high].func_ref} kept the spawn target's task_id")
+    else:
+        print(f"ERROR: Should have fused the tail into the spawn target, removed {removed}")
+
+    ran.clear()
+    Orchestrator().run(wf3)
+    if ran == expected:
+        print(f"✓ {chooser.__name__} ran {ran}")
+    else:
+        print(f"ERROR: Should have run {expected}, got {ran}")
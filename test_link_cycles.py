@@ -0,0 +1,140 @@
+from client.workflow import Workflow
+
+def task_a():
+    print("A")
+
+def task_b():
+    print("B")
+
+def task_c():
+    print("C")
+
+def task_d():
+    print("D")
+
+def task_e():
+    print("E")
+
+def check_order(wf):
+    """Every dep must come before its dependent, both in topo_order() and in the ranks link() maintains"""
+    position = {tid: i for i, tid in enumerate(wf.topo_order())}
+    for tid, spec in wf._tasks.items():
+        for dep_id in spec.deps:
+            if position[dep_id] >= position[tid] or wf._order[dep_id] >= wf._order[tid]:
+                return False
+    return len(position) == len(wf._tasks)
+
+# Test 1: Self-link is a cycle
+print("=== Test 1: Self-link ===")
+wf1 = Workflow("test_self_link")
+t_a = wf1.task(task_a)
+
+try:
+    wf1.link(t_a, t_a)
+    print("ERROR: Should have raised ValueError!")
+except ValueError as e:
+    print(f"✓ Correctly raised error: {e}")
+
+# Test 2: Two-task cycle
+print("\n=== Test 2: Two-task cycle ===")
+wf2 = Workflow("test_two_cycle")
+t_a = wf2.task(task_a)
+t_b = wf2.task(task_b)
+wf2.link(t_a, t_b)
+
+try:
+    wf2.link(t_b, t_a)
+    print("ERROR: Should have raised ValueError!")
+except ValueError as e:
+    print(f"✓ Correctly raised error: {e}")
+
+if wf2._tasks[t_a].deps:
+    print("ERROR: Should have left the rejected edge out!")
+else:
+    print("✓ Rejected edge was not added")
+
+# Test 3: Longer cycle, closed by a backward link
+print("\n=== Test 3: Longer cycle ===")
+wf3 = Workflow("test_long_cycle")
+t_a = wf3.task(task_a)
+t_b = wf3.task(task_b)
+t_c = wf3.task(task_c)
+t_d = wf3.task(task_d)
+wf3.link(t_a, t_b)
+wf3.link(t_b, t_c)
+wf3.link(t_c, t_d)
+
+try:
+    wf3.link(t_d, t_a)
+    print("ERROR: Should have raised ValueError!")
+except ValueError as e:
+    print(f"✓ Correctly raised error: {e}")
+
+# Test 4: Linking the same pair twice is a no-op
+print("\n=== Test 4: Duplicate link ===")
+wf4 = Workflow("test_duplicate_link")
+t_a = wf4.task(task_a)
+t_b = wf4.task(task_b)
+wf4.link(t_a, t_b)
+wf4.link(t_a, t_b)
+
+if wf4._tasks[t_b].deps == [t_a] and wf4.children_index()[t_a] == [t_b]:
+    print("✓ Duplicate link recorded once")
+else:
+    print(f"ERROR: Should have recorded one edge, got deps={wf4._tasks[t_b].deps}")
+
+# Test 5: Backward links reorder the topological ranks
+print("\n=== Test 5: topo_order after backward links ===")
+wf5 = Workflow("test_backward_links")
+t_a = wf5.task(task_a)
+t_b = wf5.task(task_b)
+t_c = wf5.task(task_c)
+t_d = wf5.task(task_d)
+t_e = wf5.task(task_e)
+# Every link points from a later task to an earlier one
+wf5.link(t_e, t_d)
+wf5.link(t_d, t_c)
+wf5.link(t_c, t_b)
+wf5.link(t_b, t_a)
+wf5.link(t_e, t_a)
+
+if check_order(wf5):
+    print(f"✓ topo_order respects every edge: {[wf5._tasks[t].func_ref for t in wf5.topo_order()]}")
+else:
+    print(f"ERROR: Should have ordered deps first, got {wf5.topo_order()}")
+
+try:
+    wf5.link(t_a, t_e)
+    print("ERROR: Should have raised ValueError!")
+except ValueError as e:
+    print(f"✓ Correctly raised error after reordering: {e}")
+
+# Test 6: Mixed forward and backward links into the middle of the order
+print("\n=== Test 6: Interleaved links ===")
+wf6 = Workflow("test_interleaved_links")
+t_a = wf6.task(task_a)
+t_b = wf6.task(task_b)
+t_c = wf6.task(task_c)
+t_d = wf6.task(task_d)
+t_e = wf6.task(task_e)
+wf6.link(t_a, t_c)
+wf6.link(t_d, t_b)
+wf6.link(t_c, t_d)
+wf6.link(t_e, t_a)
+# Chain is now e -> a -> c -> d -> b
+
+if check_order(wf6):
+    print("✓ topo_order respects every edge")
+else:
+    print(f"ERROR: Should have ordered deps first, got {wf6.topo_order()}")
+
+try:
+    wf6.link(t_b, t_e)
+    print("ERROR: Should have raised ValueError!")
+except ValueError as e:
+    print(f"✓ Correctly raised error: {e}")
+
+if check_order(wf6):
+    print("✓ Rejected link left the order intact")
+else:
+    print(f"ERROR: Should have kept a valid order, got {wf6.topo_order()}")
@@ -0,0 +1,308 @@
+import asyncio
+import gc
+import threading
+import time
+import warnings
+from client.workflow import Workflow
+from server.orchestrator import Orchestrator
+
+ran = []
+
+def sleep_1():
+    time.sleep(0.3)
+
+def sleep_2():
+    time.sleep(0.3)
+
+def sleep_3():
+    time.sleep(0.3)
+
+def step_a():
+    ran.append("a")
+
+def step_b():
+    ran.append("b")
+
+def step_c():
+    ran.append("c")
+
+def step_d():
+    ran.append("d")
+
+def lookup_missing():
+    return {}["missing"]
+
+def load_dimensions():
+    ran.append("dimensions")
+
+def choose_step():
+    return step_a
+
+def record_thread():
+    ran.append(threading.current_thread().name)
+
+def timed_run(orchestrator, wf):
+    start = time.perf_counter()
+    orchestrator.run(wf)
+    return time.perf_counter() - start
+
+# Test 1: max_concurrency must allow at least one task
+print("=== Test 1: Invalid max_concurrency ===")
+for bad in (0, -1):
+    try:
+        Orchestrator(max_concurrency=bad)
+        print("ERROR: Should have raised ValueError!")
+    except ValueError as e:
+        print(f"✓ Correctly raised error: {e}")
+
+# Test 2: Independent tasks overlap, max_concurrency=1 serializes them
+print("\n=== Test 2: Concurrency limit ===")
+wf2 = Workflow("test_concurrency")
+for fn in (sleep_1, sleep_2, sleep_3):
+    wf2.task(fn)
+
+elapsed = timed_run(Orchestrator(max_concurrency=3), wf2)
+if elapsed < 0.6:
+    print(f"✓ Three 0.3s tasks overlapped: {elapsed:.2f}s")
+else:
+    print(f"ERROR: Should have overlapped the tasks, took {elapsed:.2f}s")
+
+elapsed = timed_run(Orchestrator(max_concurrency=1), wf2)
+if elapsed > 0.85:
+    print(f"✓ max_concurrency=1 ran them one at a time: {elapsed:.2f}s")
+else:
+    print(f"ERROR: Should have serialized the tasks, took {elapsed:.2f}s")
+
+# Test 3: Linear chains start the successor directly on completion
+print("\n=== Test 3: Chain dispatch ===")
+wf3 = Workflow("test_chain_dispatch")
+t_a = wf3.task(step_a)
+t_b = wf3.task(step_b)
+t_c = wf3.task(step_c)
+t_d = wf3.task(step_d)
+wf3.link(t_a, t_b)
+wf3.link(t_b, t_c)
+wf3.link(t_b, t_d)  # b has two successors, so only a -> b is a chain
+
+orch3 = Orchestrator(max_concurrency=1)
+ran.clear()
+result = orch3.run(wf3)
+resolver = orch3._plan_cache[wf3][1]
+row = resolver.id_to_idx
+if resolver.chain_next[row[t_a]] == row[t_b] and resolver.chain_next[row[t_b]] == -1:
+    print("✓ Only a -> b is treated as a chain")
+else:
+    print(f"ERROR: Should have chained a -> b only, got {list(resolver.chain_next)}")
+
+if ran[:2] == ["a", "b"] and sorted(ran[2:]) == ["c", "d"] and len(result) == 4:
+    print(f"✓ Chain ran in order: {ran}")
+else:
+    print(f"ERROR: Should have run a, b, then c and d, got {ran}")
+
+# Test 4: The plan is reused until the workflow changes
+print("\n=== Test 4: Plan cache ===")
+wf4 = Workflow("test_plan_cache")
+t_a = wf4.task(step_a)
+orch4 = Orchestrator()
+orch4.run(wf4)
+first = orch4._plan_cache[wf4][1]
+orch4.run(wf4)
+if orch4._plan_cache[wf4][1] is first:
+    print("✓ Unchanged workflow reused its resolver")
+else:
+    print("ERROR: Should have reused the resolver of an unchanged workflow!")
+
+t_b = wf4.task(step_b)
+wf4.link(t_a, t_b)
+ran.clear()
+result = orch4.run(wf4)
+if orch4._plan_cache[wf4][1] is not first and ran == ["a", "b"] and len(result) == 2:
+    print("✓ Changed workflow got a new resolver and ran the new task")
+else:
+    print(f"ERROR: Should have rebuilt the resolver after link(), ran {ran}")
+
+# Test 5: A failing task re-raises its own exception, noting which task failed
+print("\n=== Test 5: Task failure ===")
+wf5 = Workflow("test_task_failure")
+wf5.task(lookup_missing)
+
+for slots in (1, 2):  # inline and thread-pool paths
+    try:
+        Orchestrator(max_concurrency=slots).run(wf5)
+        print("ERROR: Should have raised KeyError!")
+    except KeyError as e:
+        notes = getattr(e, "__notes__", [])
+        if "Task lookup_missing failed" in notes:
+            print(f"✓ Correctly raised KeyError with note: {notes}")
+        else:
+            print(f"ERROR: Should have noted the failed task, got {notes}")
+
+# Test 6: Tasks whose functions share a name still run their own function
+print("\n=== Test 6: Same-name functions ===")
+def make_step(label):
+    def step():
+        ran.append(label)
+    return step
+
+wf6 = Workflow("test_same_name")
+wf6.task(lambda: ran.append("lambda_1"))
+wf6.task(lambda: ran.append("lambda_2"))
+wf6.task(make_step("step_1"))
+wf6.task(make_step("step_2"))
+
+ran.clear()
+Orchestrator().run(wf6)
+if sorted(ran) == ["lambda_1", "lambda_2", "step_1", "step_2"]:
+    print(f"✓ Each task ran its own function: {ran}")
+else:
+    print(f"ERROR: Should have run every function once, got {ran}")
+
+# Test 7: Pure tasks run once per Orchestrator, across runs
+print("\n=== Test 7: Pure tasks ===")
+wf7 = Workflow("test_pure")
+t_dims = wf7.task(load_dimensions, pure=True)
+t_b = wf7.task(step_b)
+wf7.link(t_dims, t_b)
+
+orch7 = Orchestrator()
+ran.clear()
+orch7.run(wf7)
+orch7.run(wf7)
+if ran == ["dimensions", "b", "b"]:
+    print("✓ Pure task skipped on the second run")
+else:
+    print(f"ERROR: Should have run the pure task once, got {ran}")
+
+ran.clear()
+Orchestrator().run(wf7)
+if ran == ["dimensions", "b"]:
+    print("✓ A new Orchestrator runs the pure task again")
+else:
+    print(f"ERROR: Should have run the pure task again, got {ran}")
+
+wf7_extra = Workflow("test_pure_dropped")
+wf7_extra.task(lambda: ran.append("dropped"), pure=True)
+orch7.run(wf7_extra)
+del wf7_extra
+gc.collect()
+if len(orch7._completed_pure) == 1:
+    print("✓ Dropped workflow's pure task is no longer remembered")
+else:
+    print(f"ERROR: Should have forgotten the dropped workflow's task, still holding {len(orch7._completed_pure)}")
+
+try:
+    wf7.task(choose_step, possible_branches=[step_a], pure=True)
+    print("ERROR: Should have raised ValueError!")
+except ValueError as e:
+    print(f"✓ Correctly raised error: {e}")
+
+# Test 8: run() and run_async() both work inside a running event loop
+print("\n=== Test 8: Event loop callers ===")
+wf8 = Workflow("test_run_async")
+t_a = wf8.task(step_a)
+t_b = wf8.task(step_b)
+wf8.link(t_a, t_b)
+
+async def run_inside_loop():
+    orch = Orchestrator()
+    try:
+        blocking_result = orch.run(wf8)
+        print(f"✓ run() worked inside a running loop: {len(blocking_result)} tasks")
+    except RuntimeError as e:
+        print(f"ERROR: Should have run inside the loop: {e}")
+    return await orch.run_async(wf8)
+
+with warnings.catch_warnings(record=True) as caught:
+    warnings.simplefilter("always")
+    ran.clear()
+    result = asyncio.run(run_inside_loop())
+    gc.collect()
+
+if ran == ["a", "b", "a", "b"] and len(result) == 2:
+    print("✓ run_async ran the workflow on the caller's loop")
+else:
+    print(f"ERROR: Should have run a, b twice, got {ran}")
+
+if not caught:
+    print("✓ No coroutine was left un-awaited")
+else:
+    print(f"ERROR: Should not have warned, got {[str(w.message) for w in caught]}")
+
+# Test 9: Ready tasks on equally long paths follow the plan's cost order
+print("\n=== Test 9: Cost order among ready tasks ===")
+wf9 = Workflow("test_cost_order")
+wf9.task(step_a, cost=4.0)
+wf9.task(step_b, cost=1.0, selectivity=0.1)
+wf9.task(step_c, cost=2.0, selectivity=0.5)
+
+ran.clear()
+Orchestrator(max_concurrency=1).run(wf9)
+if ran == ["b", "c", "a"]:
+    print(f"✓ Cheap selective tasks ran first: {ran}")
+else:
+    print(f"ERROR: Should have run b, c, a, got {ran}")
+
+# Test 10: A free slot goes to the critical path, not to whatever became ready first
+print("\n=== Test 10: Critical path first ===")
+wf10 = Workflow("test_critical_path")
+t_x = wf10.task(make_step("X"))
+t_y = wf10.task(make_step("Y"))
+t_z = wf10.task(make_step("Z"))
+t_w = wf10.task(make_step("W"))
+wf10.link(t_x, t_y)
+wf10.link(t_y, t_z)
+wf10.link(t_x, t_w)
+for k in range(5):
+    wf10.task(make_step(f"L{k}"))
+
+ran.clear()
+Orchestrator(max_concurrency=1).run(wf10)
+if ran[:2] == ["X", "Y"] and len(ran) == 9:
+    print(f"✓ Y took the slot ahead of the independent leaves: {ran}")
+else:
+    print(f"ERROR: Should have run X then Y first, got {ran}")
+
+# Test 11: Concurrent runs on one Orchestrator keep separate state
+print("\n=== Test 11: Concurrent run_async ===")
+def pause():
+    time.sleep(0.05)
+
+wf11_static = Workflow("test_concurrent_static")
+previous = None
+for k in range(4):
+    current = wf11_static.task(pause)
+    if previous is not None:
+        wf11_static.link(previous, current)
+    previous = current
+
+wf11_branch = Workflow("test_concurrent_branch")
+t_eval = wf11_branch.branched_task(choose_step, [step_a, step_b])
+t_after = wf11_branch.task(step_c)
+wf11_branch.link(wf11_branch.get_task(step_a), t_after)
+
+async def run_both():
+    orch = Orchestrator(max_concurrency=2)
+    return await asyncio.gather(orch.run_async(wf11_static), orch.run_async(wf11_branch))
+
+ran.clear()
+try:
+    static_result, branch_result = asyncio.run(run_both())
+    if len(static_result) == 4 and len(branch_result) == 3 and sorted(ran) == ["a", "c"]:
+        print(f"✓ Both runs finished with their own results: {ran}")
+    else:
+        print(f"ERROR: Should have finished both runs, got {static_result}, {branch_result}, ran {ran}")
+except RuntimeError as e:
+    print(f"ERROR: Should not have failed: {e}")
+
+# Test 12: max_concurrency=1 runs tasks inline on the caller's thread
+print("\n=== Test 12: Inline fast path ===")
+wf12 = Workflow("test_inline")
+wf12.task(record_thread)
+
+ran.clear()
+Orchestrator(max_concurrency=1).run(wf12)
+Orchestrator(max_concurrency=2).run(wf12)
+if ran[0] == threading.current_thread().name and ran[1].startswith("wf-task"):
+    print(f"✓ max_concurrency=1 skipped the worker pool: {ran}")
+else:
+    print(f"ERROR: Should have run inline only with one slot, got {ran}")
@@ -1,34 +1,65 @@
+import sys
+from array import array
 from dataclasses import dataclass, field
-from typing import List, Optional, Dict
+from typing import Callable, List, Optional, Dict, Set, Tuple
 
 
 class Constraint:
     """Base class for workflow constraints"""
-    pass
+    __slots__ = ()  # stateless markers, no per-instance __dict__
 
 
 class StaticConstraint(Constraint):
     """Task cannot be a dynamic/branching task"""
+    __slots__ = ()
+
     def __repr__(self):
         return "STATIC"
 
 
 class NoOutgoingEdgesConstraint(Constraint):
     """No edges can be created starting at this task (task cannot have successors)"""
+    __slots__ = ()
+
     def __repr__(self):
         return "NO_OUTGOING_EDGES"
 
 
 class NoIncomingEdgesConstraint(Constraint):
     """No edges can be created ending at this task (task cannot have dependencies)"""
+    __slots__ = ()
+
     def __repr__(self):
         return "NO_INCOMING_EDGES"
 
 
-@dataclass
+@dataclass(slots=True)
 class TaskSpec:
-    task_id: str        # UUID
+    task_id: int        # Per-workflow counter, rendered as f"t{task_id}" when serialized
     func_ref: str       # Function name in registry
-    deps: List[str] = field(default_factory=list)  # List of task_ids this depends on
-    dynamic_spawns: Optional[Dict[str, str]] = None  # None = static, {"label": task_id} = branching task
+    deps: List[int] = field(default_factory=list)  # List of task_ids this depends on
+    dynamic_spawns: Optional[Dict[str, int]] = None  # None = static, {"label": task_id} = branching task
     constraints: List[Constraint] = field(default_factory=list)  # Constraints to validate at runtime
+    cost: float = 1.0           # Relative runtime estimate, orders independent tasks in FrozenPlan.order
+    selectivity: float = 1.0    # Expected fraction of work passed downstream (< 1 filters)
+    pure: bool = False          # No side effects: a later run may reuse the first result
+    deps_set: Set[int] = field(default_factory=set, repr=False, compare=False)  # O(1) dedup for deps
+    fn: Optional[Callable] = field(default=None, repr=False, compare=False)  # Registered callable, cached at build time
+
+    def __post_init__(self):
+        # Interned so registry and by-func_ref lookups compare by identity
+        self.func_ref = sys.intern(self.func_ref)
+        self.deps_set.update(self.deps)
+
+
+@dataclass(frozen=True, slots=True)
+class FrozenPlan:
+    """Integer-indexed execution plan produced by Workflow.plan()/freeze(). Row i is the i-th task in topological order."""
+    task_ids: Tuple[int, ...]       # row -> task_id
+    id_of: Dict[int, int]           # task_id -> row
+    func_refs: Tuple[str, ...]      # row -> function name in registry
+    indptr: array                   # successors of row i are indices[indptr[i]:indptr[i + 1]]
+    indices: array                  # successor rows, CSR
+    indeg: array                    # row -> dep count; copy before decrementing
+    dyn_mask: bytes                 # row -> 1 if the task spawns dynamic branches
+    order: Tuple[int, ...]          # rows in suggested dispatch order, see Workflow.plan